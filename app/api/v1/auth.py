@@ -1,200 +1,212 @@
 """
 Authentication routes for GitHub and LinkedIn OAuth
 """
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 from app.core.config import settings
 from app.core.security import create_access_token, token_encryptor, get_current_user
-from app.models.database import get_db, User
+from app.core.http import http_client
+from app.models.database import get_db, User, LinkedInPost
 from typing import Optional
+from urllib.parse import quote
 
 router = APIRouter()
 
+# Login URLs only depend on settings, so build them once
+GITHUB_AUTH_URL = (
+    f"{settings.GITHUB_AUTHORIZATION_URL}?"
+    f"client_id={settings.GITHUB_CLIENT_ID}&"
+    f"redirect_uri={quote(settings.GITHUB_REDIRECT_URI, safe='')}&"
+    f"scope=read:user,user:email,repo"
+)
+LINKEDIN_AUTH_URL = (
+    f"{settings.LINKEDIN_AUTHORIZATION_URL}?"
+    f"response_type=code&"
+    f"client_id={settings.LINKEDIN_CLIENT_ID}&"
+    f"redirect_uri={quote(settings.LINKEDIN_REDIRECT_URI, safe='')}&"
+    f"scope={quote('openid profile email w_member_social')}"
+)
+
+
+def _check_user_info_responses(*responses: httpx.Response):
+    """Raise if any of the user info responses failed"""
+    if any(response.status_code != 200 for response in responses):
+        raise HTTPException(status_code=400, detail="Failed to get user info")
+
 
 @router.get("/github/login")
 async def github_login():
     """Initiate GitHub OAuth flow"""
-    auth_url = (
-        f"{settings.GITHUB_AUTHORIZATION_URL}?"
-        f"client_id={settings.GITHUB_CLIENT_ID}&"
-        f"redirect_uri={settings.GITHUB_REDIRECT_URI}&"
-        f"scope=read:user,user:email,repo"
-    )
-    return {"auth_url": auth_url}
+    return {"auth_url": GITHUB_AUTH_URL}
 
 
 @router.get("/github/callback")
 async def github_callback(
     code: str = Query(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    client: httpx.AsyncClient = Depends(http_client)
 ):
     """Handle GitHub OAuth callback"""
     # Exchange code for access token
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(
-            settings.GITHUB_TOKEN_URL,
-            data={
-                "client_id": settings.GITHUB_CLIENT_ID,
-                "client_secret": settings.GITHUB_CLIENT_SECRET,
-                "code": code,
-                "redirect_uri": settings.GITHUB_REDIRECT_URI
-            },
-            headers={"Accept": "application/json"}
-        )
-        
-        if token_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get access token")
-        
-        token_data = token_response.json()
-        access_token = token_data.get("access_token")
-        
-        # Get user info
-        user_response = await client.get(
-            f"{settings.GITHUB_API_URL}/user",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-        
-        if user_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get user info")
-        
-        user_data = user_response.json()
-        
-        # Get user email
-        email_response = await client.get(
-            f"{settings.GITHUB_API_URL}/user/emails",
-            headers={"Authorization": f"Bearer {access_token}"}
+    token_response = await client.post(
+        settings.GITHUB_TOKEN_URL,
+        data={
+            "client_id": settings.GITHUB_CLIENT_ID,
+            "client_secret": settings.GITHUB_CLIENT_SECRET,
+            "code": code,
+            "redirect_uri": settings.GITHUB_REDIRECT_URI
+        },
+        headers={"Accept": "application/json"}
+    )
+    
+    if token_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get access token")
+    
+    token_data = token_response.json()
+    access_token = token_data.get("access_token")
+    
+    # Get user info and emails concurrently
+    headers = {"Authorization": f"Bearer {access_token}"}
+    user_response, email_response = await asyncio.gather(
+        client.get(f"{settings.GITHUB_API_URL}/user", headers=headers),
+        client.get(f"{settings.GITHUB_API_URL}/user/emails", headers=headers)
+    )
+    _check_user_info_responses(user_response, email_response)
+    
+    user_data = user_response.json()
+    emails = email_response.json()
+    primary_email = next((e["email"] for e in emails if e["primary"]), emails[0]["email"])
+    
+    # Create or update user
+    user = await db.scalar(select(User).where(User.github_id == str(user_data["id"])))
+    
+    if not user:
+        user = User(
+            github_id=str(user_data["id"]),
+            github_username=user_data["login"],
+            email=primary_email,
+            github_access_token=token_encryptor.encrypt_token(access_token)
         )
-        emails = email_response.json()
-        primary_email = next((e["email"] for e in emails if e["primary"]), emails[0]["email"])
-        
-        # Create or update user
-        user = db.query(User).filter(User.github_id == str(user_data["id"])).first()
-        
-        if not user:
-            user = User(
-                github_id=str(user_data["id"]),
-                github_username=user_data["login"],
-                email=primary_email,
-                github_access_token=token_encryptor.encrypt_token(access_token)
-            )
-            db.add(user)
-        else:
-            user.github_access_token = token_encryptor.encrypt_token(access_token)
-            user.github_username = user_data["login"]
-        
-        db.commit()
-        db.refresh(user)
-        
-        # Create JWT token
-        jwt_token = create_access_token(data={"sub": str(user.id), "github_id": user.github_id})
-        
-        return {
-            "access_token": jwt_token,
-            "token_type": "bearer",
-            "user": {
-                "id": user.id,
-                "github_username": user.github_username,
-                "email": user.email
-            }
+        db.add(user)
+    else:
+        user.github_access_token = token_encryptor.encrypt_token(access_token)
+        user.github_username = user_data["login"]
+    
+    await db.commit()
+    await db.refresh(user)
+    
+    # Create JWT token
+    jwt_token = create_access_token(data={"sub": str(user.id), "github_id": user.github_id})
+    
+    return {
+        "access_token": jwt_token,
+        "token_type": "bearer",
+        "user": {
+            "id": user.id,
+            "github_username": user.github_username,
+            "email": user.email
         }
+    }
 
 
 @router.get("/linkedin/login")
 async def linkedin_login():
     """Initiate LinkedIn OAuth flow"""
-    auth_url = (
-        f"{settings.LINKEDIN_AUTHORIZATION_URL}?"
-        f"response_type=code&"
-        f"client_id={settings.LINKEDIN_CLIENT_ID}&"
-        f"redirect_uri={settings.LINKEDIN_REDIRECT_URI}&"
-        f"scope=openid profile email w_member_social"
-    )
-    return {"auth_url": auth_url}
+    return {"auth_url": LINKEDIN_AUTH_URL}
 
 
 @router.get("/linkedin/callback")
 async def linkedin_callback(
     code: str = Query(...),
-    db: Session = Depends(get_db),
-    user_id: Optional[int] = Query(None)
+    db: AsyncSession = Depends(get_db),
+    user_id: Optional[int] = Query(None),
+    client: httpx.AsyncClient = Depends(http_client)
 ):
     """Handle LinkedIn OAuth callback"""
     # Exchange code for access token
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(
-            settings.LINKEDIN_TOKEN_URL,
-            data={
-                "grant_type": "authorization_code",
-                "code": code,
-                "client_id": settings.LINKEDIN_CLIENT_ID,
-                "client_secret": settings.LINKEDIN_CLIENT_SECRET,
-                "redirect_uri": settings.LINKEDIN_REDIRECT_URI
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
-        )
-        
-        if token_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get access token")
-        
-        token_data = token_response.json()
-        access_token = token_data.get("access_token")
-        refresh_token = token_data.get("refresh_token")
-        
-        # Get LinkedIn user info
-        user_response = await client.get(
-            f"{settings.LINKEDIN_API_URL}/userinfo",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-        
-        if user_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get user info")
-        
-        linkedin_data = user_response.json()
-        
-        # Update existing user or create new one
-        if user_id:
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-        else:
-            # Try to find user by LinkedIn ID
-            user = db.query(User).filter(User.linkedin_id == linkedin_data.get("sub")).first()
-            if not user:
-                raise HTTPException(status_code=400, detail="Please login with GitHub first")
-        
-        user.linkedin_id = linkedin_data.get("sub")
-        user.linkedin_access_token = token_encryptor.encrypt_token(access_token)
-        if refresh_token:
-            user.linkedin_refresh_token = token_encryptor.encrypt_token(refresh_token)
-        
-        db.commit()
-        db.refresh(user)
-        
-        return {
-            "success": True,
-            "message": "LinkedIn account connected successfully",
-            "user": {
-                "id": user.id,
-                "linkedin_connected": True
-            }
+    token_response = await client.post(
+        settings.LINKEDIN_TOKEN_URL,
+        data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "client_id": settings.LINKEDIN_CLIENT_ID,
+            "client_secret": settings.LINKEDIN_CLIENT_SECRET,
+            "redirect_uri": settings.LINKEDIN_REDIRECT_URI
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    
+    if token_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get access token")
+    
+    token_data = token_response.json()
+    access_token = token_data.get("access_token")
+    refresh_token = token_data.get("refresh_token")
+    
+    # Get LinkedIn user info
+    user_response = await client.get(
+        f"{settings.LINKEDIN_API_URL}/userinfo",
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    
+    if user_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get user info")
+    
+    linkedin_data = user_response.json()
+    
+    # Update existing user or create new one
+    if user_id:
+        user = await db.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+    else:
+        # Try to find user by LinkedIn ID
+        user = await db.scalar(select(User).where(User.linkedin_id == linkedin_data.get("sub")))
+        if not user:
+            raise HTTPException(status_code=400, detail="Please login with GitHub first")
+    
+    user.linkedin_id = linkedin_data.get("sub")
+    user.linkedin_access_token = token_encryptor.encrypt_token(access_token)
+    if refresh_token:
+        user.linkedin_refresh_token = token_encryptor.encrypt_token(refresh_token)
+    
+    await db.commit()
+    await db.refresh(user)
+    
+    return {
+        "success": True,
+        "message": "LinkedIn account connected successfully",
+        "user": {
+            "id": user.id,
+            "linkedin_connected": True
         }
+    }
 
 
 @router.get("/me")
 async def get_current_user(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get current user info"""
-    user = db.query(User).filter(User.id == current_user["user_id"]).first()
-    if not user:
+    result = await db.execute(
+        select(User, func.count(LinkedInPost.id))
+        .outerjoin(User.posts)
+        .where(User.id == current_user["user_id"])
+        .group_by(User.id)
+    )
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="User not found")
 
+    user, posts_count = row
     return {
         "id": user.id,
         "email": user.email,
         "github_username": user.github_username,
         "linkedin_connected": user.linkedin_id is not None,
-        "posts_count": len(user.posts) if user.posts else 0
+        "posts_count": posts_count
     }
@@ -2,12 +2,14 @@
 Posts management routes: summarization and LinkedIn posting
 """
 from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 from typing import Optional, Dict
 from app.core.config import settings
 from app.core.security import token_encryptor
-from app.models.database import get_db, User, Repository, LinkedInPost
+from app.models.database import get_db, SessionLocal, User, Repository, LinkedInPost
 from app.services.github_service import GitHubService
 from app.services.free_summarization_service import FreeSummarizationService
 from app.services.linkedin_service import LinkedInService
@@ -17,27 +19,30 @@ github_service = GitHubService()
 summarization_service = FreeSummarizationService()
 linkedin_service = LinkedInService()
 
+POST_PREVIEW_LENGTH = 200
+
 
 @router.post("/summarize/{repo_id}")
 async def summarize_repository(
     repo_id: str,
     tone: str = Query("professional", description="Post tone: professional, playful, technical, cocky"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: int = Query(...)  # Would come from JWT
 ):
     """Generate a LinkedIn post summary for a repository"""
     
-    # Find repository
-    repo = db.query(Repository).filter(
+    # Find repository together with its owner
+    result = await db.execute(select(Repository, User).join(User, User.id == Repository.user_id).where(
         Repository.github_repo_id == repo_id,
         Repository.user_id == user_id
-    ).first()
+    ))
+    row = result.first()
     
-    if not repo:
+    if not row:
         raise HTTPException(status_code=404, detail="Repository not found")
     
-    # Get user and check GitHub access
-    user = db.query(User).filter(User.id == user_id).first()
+    # Check GitHub access
+    repo, user = row
     if not user.github_access_token:
         raise HTTPException(status_code=400, detail="GitHub not connected")
     
@@ -59,8 +64,8 @@ async def summarize_repository(
         )
         
         db.add(linkedin_post)
-        db.commit()
-        db.refresh(linkedin_post)
+        await db.commit()
+        await db.refresh(linkedin_post)
         
         return {
             "post_id": linkedin_post.id,
@@ -82,16 +87,16 @@ async def customize_post(
     post_id: int,
     tone: str = Query("professional"),
     custom_instructions: str = Query("", description="Additional customization instructions"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: int = Query(...)  # Would come from JWT
 ):
     """Customize an existing post"""
     
     # Find post
-    post = db.query(LinkedInPost).filter(
+    post = await db.scalar(select(LinkedInPost).where(
         LinkedInPost.id == post_id,
         LinkedInPost.user_id == user_id
-    ).first()
+    ))
     
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -105,7 +110,7 @@ async def customize_post(
         # Update post
         post.content = customized_content
         post.tone = tone
-        db.commit()
+        await db.commit()
         
         return {
             "post_id": post.id,
@@ -122,35 +127,42 @@ async def customize_post(
 async def post_to_linkedin(
     post_id: int,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: int = Query(...)  # Would come from JWT
 ):
     """Post to LinkedIn"""
     
-    # Find post
-    post = db.query(LinkedInPost).filter(
+    # Find post together with its author
+    result = await db.execute(select(LinkedInPost, User).join(User, User.id == LinkedInPost.user_id).where(
         LinkedInPost.id == post_id,
         LinkedInPost.user_id == user_id
-    ).first()
+    ))
+    row = result.first()
     
-    if not post:
+    if not row:
         raise HTTPException(status_code=404, detail="Post not found")
     
     # Check LinkedIn connection
-    user = db.query(User).filter(User.id == user_id).first()
+    post, user = row
     if not user.linkedin_access_token:
         raise HTTPException(status_code=400, detail="LinkedIn not connected")
     
+    # Decrypt once here so the background task gets a ready-to-use token
+    try:
+        access_token = token_encryptor.decrypt_token(user.linkedin_access_token)
+    except Exception:
+        # Corrupt value or one encrypted under a rotated key
+        raise HTTPException(status_code=400, detail="LinkedIn not connected, please reauthorize")
+    
     # Update status to posting
     post.status = "posting"
-    db.commit()
+    await db.commit()
     
     # Post in background
     background_tasks.add_task(
         post_to_linkedin_background,
         post_id,
-        user.linkedin_access_token,
-        db
+        access_token
     )
     
     return {
@@ -160,61 +172,78 @@ async def post_to_linkedin(
     }
 
 
-async def post_to_linkedin_background(post_id: int, encrypted_token: str, db: Session):
+async def post_to_linkedin_background(post_id: int, access_token: str):
     """Background task to post to LinkedIn"""
-    try:
+    # The request's session is closed before background tasks run, so use our own
+    async with SessionLocal() as db:
         # Get post
-        post = db.query(LinkedInPost).filter(LinkedInPost.id == post_id).first()
+        post = await db.get(LinkedInPost, post_id)
         if not post:
             return
         
-        # Decrypt token
-        access_token = token_encryptor.decrypt_token(encrypted_token)
-        
-        # Post to LinkedIn
-        post_url = await linkedin_service.post_content(access_token, post.content)
-        
-        # Update post status
-        post.status = "posted"
-        post.linkedin_post_id = post_url
-        from datetime import datetime
-        post.posted_at = datetime.utcnow()
-        db.commit()
-        
-    except Exception as e:
-        # Update status to failed
-        post.status = "failed"
-        db.commit()
-        print(f"Failed to post to LinkedIn: {str(e)}")
+        try:
+            # Post to LinkedIn
+            post_url = await linkedin_service.post_content(access_token, post.content)
+            
+            # Update post status
+            post.status = "posted"
+            post.linkedin_post_id = post_url
+            post.posted_at = func.now()
+            await db.commit()
+            
+        except Exception as e:
+            # Update status to failed
+            post.status = "failed"
+            await db.commit()
+            print(f"Failed to post to LinkedIn: {str(e)}")
 
 
 @router.get("/user")
 async def get_user_posts(
-    db: Session = Depends(get_db),
-    user_id: int = Query(...)  # Would come from JWT
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Query(...),  # Would come from JWT
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0)
 ):
     """Get user's posts"""
     
-    posts = db.query(LinkedInPost).filter(
+    # Only fetch the columns we return; content is cut to one char past the
+    # preview length so we can still tell whether it was truncated
+    result = await db.execute(select(
+        LinkedInPost.id,
+        func.substr(LinkedInPost.content, 1, POST_PREVIEW_LENGTH + 1).label("content"),
+        LinkedInPost.tone,
+        LinkedInPost.status,
+        LinkedInPost.posted_at,
+        Repository.id.label("repository_id"),
+        Repository.name.label("repository_name"),
+        Repository.url.label("repository_url")
+    ).outerjoin(
+        Repository, Repository.id == LinkedInPost.repository_id
+    ).where(
         LinkedInPost.user_id == user_id
-    ).order_by(LinkedInPost.created_at.desc()).all()
+    ).order_by(LinkedInPost.created_at.desc()).offset(offset).limit(limit))
+    posts = result.all()
     
-    return {
+    # Plain dicts of JSON/datetime values: hand straight to orjson, skipping jsonable_encoder
+    return ORJSONResponse({
         "posts": [
             {
                 "id": post.id,
-                "content": post.content[:200] + "..." if len(post.content) > 200 else post.content,
+                "content": post.content[:POST_PREVIEW_LENGTH] + "..." if len(post.content) > POST_PREVIEW_LENGTH else post.content,
                 "tone": post.tone,
                 "status": post.status,
                 "posted_at": post.posted_at,
                 "repository": {
-                    "name": post.repository.name,
-                    "url": post.repository.url
-                } if post.repository else None
+                    "name": post.repository_name,
+                    "url": post.repository_url
+                } if post.repository_id else None
             }
             for post in posts
-        ]
-    }
+        ],
+        "limit": limit,
+        "offset": offset
+    })
 
 
 @router.get("/tones")
@@ -1,13 +1,17 @@
 """
 Repository management routes
 """
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 from typing import List, Optional
 from app.core.config import settings
 from app.core.security import token_encryptor
 from app.models.database import get_db, User, Repository
+from app.models.schemas import RepositoryOut
 from app.services.github_service import GitHubService
 
 router = APIRouter()
@@ -16,11 +20,11 @@ github_service = GitHubService()
 
 @router.get("/list")
 async def list_repositories(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: int = Query(...)  # Would come from JWT in real implementation
 ):
     """List user's GitHub repositories"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -29,16 +33,23 @@ async def list_repositories(
     
     try:
         access_token = token_encryptor.decrypt_token(user.github_access_token)
-        repos = await github_service.get_user_repos(access_token)
         
-        # Get existing monitored repos
-        monitored_repo_ids = {r.github_repo_id for r in user.repos if r.is_monitored}
+        # Fetch repos from GitHub while looking up the monitored ones
+        repos, monitored_repo_ids = await asyncio.gather(
+            github_service.get_user_repos(access_token),
+            db.scalars(select(Repository.github_repo_id).where(
+                Repository.user_id == user.id,
+                Repository.is_monitored == True
+            ))
+        )
+        monitored_repo_ids = set(monitored_repo_ids)
         
         # Mark which ones are already monitored
         for repo in repos:
             repo["is_monitored"] = str(repo["id"]) in monitored_repo_ids
         
-        return {"repositories": repos}
+        # Plain dicts of JSON types: hand straight to orjson, skipping jsonable_encoder
+        return ORJSONResponse({"repositories": repos})
     
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch repositories: {str(e)}")
@@ -47,14 +58,21 @@ async def list_repositories(
 @router.post("/monitor/{repo_id}")
 async def monitor_repository(
     repo_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: int = Query(...)  # Would come from JWT
 ):
     """Start monitoring a repository"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    # Load the user and any existing record for this repo in one query
+    result = await db.execute(select(User, Repository).outerjoin(
+        Repository,
+        and_(Repository.user_id == User.id, Repository.github_repo_id == repo_id)
+    ).where(User.id == user_id))
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="User not found")
     
+    user, existing_repo = row
+    
     if not user.github_access_token:
         raise HTTPException(status_code=400, detail="GitHub not connected")
     
@@ -65,14 +83,9 @@ async def monitor_repository(
         repo_data = await github_service.get_repo_details(access_token, repo_id)
         
         # Check if already exists
-        existing_repo = db.query(Repository).filter(
-            Repository.user_id == user.id,
-            Repository.github_repo_id == repo_id
-        ).first()
-        
         if existing_repo:
             existing_repo.is_monitored = True
-            db.commit()
+            await db.commit()
             return {"message": "Repository monitoring enabled", "repository": existing_repo}
         
         # Create new repository record
@@ -87,14 +100,28 @@ async def monitor_repository(
         )
         
         db.add(repo)
-        db.commit()
-        db.refresh(repo)
+        # Surface constraint errors (e.g. a repo someone else already tracks)
+        # before anything is created on GitHub
+        await db.flush()
         
-        # Set up webhook
-        webhook_id = await github_service.create_webhook(access_token, repo_data["full_name"])
+        # Set up webhook on GitHub while the new row is committed
+        committed, webhook_id = await asyncio.gather(
+            db.commit(),
+            github_service.create_webhook(access_token, repo_data["full_name"]),
+            return_exceptions=True
+        )
+        if isinstance(committed, Exception):
+            # Don't leave a hook on GitHub pointing at a row that was never saved
+            if webhook_id:
+                try:
+                    await github_service.delete_webhook(access_token, repo_data["full_name"], webhook_id)
+                except Exception as e:
+                    print(f"Failed to remove orphaned webhook {webhook_id}: {str(e)}")
+            raise committed
+        await db.refresh(repo)
         if webhook_id:
             repo.webhook_id = webhook_id
-            db.commit()
+            await db.commit()
         
         return {"message": "Repository monitoring enabled", "repository": repo}
     
@@ -105,19 +132,19 @@ async def monitor_repository(
 @router.delete("/monitor/{repo_id}")
 async def stop_monitoring_repository(
     repo_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: int = Query(...)  # Would come from JWT
 ):
     """Stop monitoring a repository"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    result = await db.execute(select(User, Repository).outerjoin(
+        Repository,
+        and_(Repository.user_id == User.id, Repository.github_repo_id == repo_id)
+    ).where(User.id == user_id))
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="User not found")
     
-    repo = db.query(Repository).filter(
-        Repository.user_id == user.id,
-        Repository.github_repo_id == repo_id
-    ).first()
-    
+    user, repo = row
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
     
@@ -131,24 +158,30 @@ async def stop_monitoring_repository(
     
     repo.is_monitored = False
     repo.webhook_id = None
-    db.commit()
+    await db.commit()
     
     return {"message": "Repository monitoring disabled"}
 
 
 @router.get("/monitored")
 async def get_monitored_repositories(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: int = Query(...)  # Would come from JWT
 ):
     """Get user's monitored repositories"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    repos = db.query(Repository).filter(
+    result = await db.execute(select(
+        Repository.id,
+        Repository.name,
+        Repository.full_name,
+        Repository.url,
+        Repository.is_monitored
+    ).where(
         Repository.user_id == user.id,
         Repository.is_monitored == True
-    ).all()
+    ))
     
-    return {"repositories": repos}
\ No newline at end of file
+    return {"repositories": [RepositoryOut.model_validate(row) for row in result]}
\ No newline at end of file
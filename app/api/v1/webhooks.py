@@ -1,58 +1,70 @@
 """
 Webhook handling for GitHub repository events
 """
-from fastapi import APIRouter, HTTPException, Request, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import hmac
 import hashlib
-import json
+import orjson
+import re
 from typing import Dict
 from app.core.config import settings
-from app.models.database import get_db, Repository, WebhookEvent
+from app.models.database import get_db, User, Repository, WebhookEvent
 from app.services.github_service import GitHubService
 from app.services.free_summarization_service import FreeSummarizationService
+from app.services.webhook_coalescer import WebhookCoalescer
+from app.services.webhook_worker import WebhookWorkerPool
 
 router = APIRouter()
 github_service = GitHubService()
 summarization_service = FreeSummarizationService()
 
+WEBHOOK_SECRET_BYTES = settings.WEBHOOK_SECRET.encode()
+_README_BODY_RE = re.compile(rb"readme", re.IGNORECASE)
+_README_FILE_RE = re.compile("readme", re.IGNORECASE)
 
-def verify_webhook_signature(request_body: bytes, signature: str, secret: str) -> bool:
+
+def verify_webhook_signature(request_body: bytes, signature: str, secret: bytes) -> bool:
     """Verify GitHub webhook signature"""
-    expected_signature = "sha256=" + hmac.new(
-        secret.encode(),
-        request_body,
-        hashlib.sha256
-    ).hexdigest()
-    return hmac.compare_digest(expected_signature, signature)
+    algorithm, _, signature_hex = signature.partition("=")
+    if algorithm != "sha256":
+        return False
+    try:
+        received = bytes.fromhex(signature_hex)
+    except ValueError:
+        return False
+    expected = hmac.new(secret, request_body, hashlib.sha256).digest()
+    return hmac.compare_digest(expected, received)
 
 
 @router.post("/github")
 async def github_webhook(
     request: Request,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_db)
 ):
     """Handle GitHub webhook events"""
+    event_type = request.headers.get("X-GitHub-Event")
+    
+    # Only process push events; decide from the header before touching the body
+    if event_type != "push":
+        return {"status": "ignored", "event": event_type}
+    
     # Get raw body for signature verification
     body = await request.body()
     
     # Verify signature
     signature = request.headers.get("X-Hub-Signature-256")
-    if signature and not verify_webhook_signature(body, signature, settings.WEBHOOK_SECRET):
+    if signature and not verify_webhook_signature(body, signature, WEBHOOK_SECRET_BYTES):
         raise HTTPException(status_code=401, detail="Invalid signature")
     
     # Parse payload
     try:
-        payload = json.loads(body.decode())
-    except json.JSONDecodeError:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON payload")
     
-    event_type = request.headers.get("X-GitHub-Event")
-    
-    # Only process push events
-    if event_type != "push":
-        return {"status": "ignored", "event": event_type}
-    
     # Extract repository info
     repo_data = payload.get("repository", {})
     repo_full_name = repo_data.get("full_name")
@@ -62,74 +74,95 @@ async def github_webhook(
         raise HTTPException(status_code=400, detail="Missing repository information")
     
     # Find monitored repository
-    repo = db.query(Repository).filter(
+    result = await db.execute(select(Repository, User).join(User, User.id == Repository.user_id).where(
         Repository.github_repo_id == repo_github_id,
         Repository.is_monitored == True
-    ).first()
+    ))
+    row = result.first()
     
-    if not repo:
+    if not row:
         return {"status": "ignored", "reason": "repository not monitored"}
     
+    repo, user = row
+    
     # Log webhook event
     webhook_event = WebhookEvent(
         repository_id=repo.id,
         event_type=event_type,
-        payload=json.dumps(payload)
+        payload=body.decode()  # Store the original JSON rather than re-serializing
     )
     db.add(webhook_event)
-    db.commit()
+    await db.commit()
     
-    # Check if README was modified
-    modified_files = []
-    commits = payload.get("commits", [])
-    for commit in commits:
-        modified_files.extend(commit.get("modified", []))
-        modified_files.extend(commit.get("added", []))
+    # The push may have changed the README, languages or contributors
+    github_service.invalidate_repo_cache(repo_full_name)
     
-    readme_modified = any("readme" in file.lower() for file in modified_files)
+    # Check if README was modified; if "readme" appears nowhere in the raw
+    # body it can't be in any filename, so skip the per-file scan
+    readme_modified = bool(_README_BODY_RE.search(body)) and any(
+        _README_FILE_RE.search(file)
+        for commit in payload.get("commits", [])
+        for file in (*commit.get("modified", []), *commit.get("added", []))
+    )
     
     if not readme_modified:
         return {"status": "processed", "readme_modified": False}
     
-    # Check if README contains "Completed"
     try:
         # Get user access token
-        user = repo.user
         if not user.github_access_token:
             return {"status": "error", "reason": "no github token"}
         
         from app.core.security import token_encryptor
         access_token = token_encryptor.decrypt_token(user.github_access_token)
         
+    except Exception as e:
+        # Log error but don't fail the webhook
+        print(f"Error processing webhook: {str(e)}")
+        return {"status": "error", "error": str(e)}
+    
+    # Check the README and summarize after responding, so GitHub isn't kept
+    # waiting (and retrying) while the summary is generated
+    if not webhook_coalescer.submit(repo.id, repo_full_name, access_token):
+        raise HTTPException(status_code=503, detail="Webhook queue is full")
+    
+    response.status_code = status.HTTP_202_ACCEPTED
+    return {"status": "accepted", "action": "readme_check_scheduled"}
+
+
+async def check_completed_project(full_name: str, access_token: str):
+    """Background task: summarize the project if its README is marked Completed"""
+    try:
+        # Nobody is waiting on this, so spread it across the app token pool
+        # when the app can see the repository
+        access_token = await github_service.server_token_for(access_token, full_name)
+        
         # Get README content
-        readme_content = await github_service.get_repo_readme(access_token, repo_full_name)
+        readme_content = await github_service.get_repo_readme(access_token, full_name)
         
         if "Completed" not in readme_content:
-            return {"status": "processed", "completed_keyword": False}
+            return
         
         # Trigger summarization and posting
-        await process_completed_project(db, repo, access_token)
-        
-        return {"status": "processed", "action": "summarization_triggered"}
+        await process_completed_project(full_name, access_token)
         
     except Exception as e:
-        # Log error but don't fail the webhook
+        # Log error; there is no webhook response left to fail
         print(f"Error processing webhook: {str(e)}")
-        return {"status": "error", "error": str(e)}
 
 
-async def process_completed_project(db: Session, repo: Repository, access_token: str):
+async def process_completed_project(full_name: str, access_token: str):
     """Process a completed project: summarize and prepare for posting"""
     try:
         # Get repository metadata
-        metadata = await github_service.get_repo_metadata(access_token, repo.full_name)
+        metadata = await github_service.get_repo_metadata(access_token, full_name)
         
         # Generate summary using free summarization service
         summary = await summarization_service.summarize_repository(metadata, "professional")
         
         # Store the summary for user review (in a real implementation, this would be stored in DB)
         # For now, we'll just log it
-        print(f"Generated summary for {repo.full_name}: {summary}")
+        print(f"Generated summary for {full_name}: {summary}")
         
         # In production, this would create a LinkedInPost record with status="draft"
         # and notify the user via email/webhook
@@ -139,6 +172,21 @@ async def process_completed_project(db: Session, repo: Repository, access_token:
         raise
 
 
+# Webhook jobs run on a bounded pool started with the app (see app.main),
+# which caps concurrent GitHub/summarization work under push bursts
+project_queue = WebhookWorkerPool(
+    check_completed_project,
+    workers=settings.WEBHOOK_WORKERS,
+    maxsize=settings.WEBHOOK_QUEUE_SIZE
+)
+# Bursts of pushes to one repo are merged into a single job before the pool
+webhook_coalescer = WebhookCoalescer(
+    project_queue.submit,
+    window=settings.WEBHOOK_COALESCE_WINDOW,
+    maxsize=settings.WEBHOOK_QUEUE_SIZE
+)
+
+
 @router.get("/test")
 async def test_webhook():
     """Test endpoint for webhook functionality"""
@@ -0,0 +1,43 @@
+"""
+Small in-process TTL cache
+"""
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+MISSING = object()
+
+
+class TTLCache:
+    """Cache whose entries expire ttl seconds after being set"""
+
+    def __init__(self, ttl: float, maxsize: int = 2048):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable) -> Any:
+        """Get a cached value, or MISSING if absent or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return MISSING
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Cache a value, evicting the oldest entry when full"""
+        self._data.pop(key, None)
+        if len(self._data) >= self.maxsize:
+            del self._data[next(iter(self._data))]
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key: Hashable):
+        """Drop a cached value"""
+        self._data.pop(key, None)
+
+    def invalidate_matching(self, predicate: Callable[[Hashable], bool]):
+        """Drop every cached value whose key satisfies predicate"""
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
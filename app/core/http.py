@@ -0,0 +1,37 @@
+"""
+Shared HTTP client for outbound API calls (GitHub, LinkedIn)
+"""
+from typing import Optional
+import httpx
+from app.core.config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the app-wide HTTP client, creating it on first use (call from the event loop)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=settings.HTTP_TIMEOUT,
+            http2=settings.HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+    return _client
+
+
+async def http_client() -> httpx.AsyncClient:
+    """Dependency for the shared client; async so FastAPI doesn't run it in the threadpool"""
+    return get_http_client()
+
+
+async def close_http_client():
+    """Close the app-wide HTTP client and release pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
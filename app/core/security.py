@@ -1,16 +1,20 @@
 """
 Security utilities: JWT, encryption, OAuth helpers
 """
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from app.core.config import settings
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import base64
 import hashlib
+import os
+import time
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
@@ -20,24 +24,36 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
-def verify_token(token: str) -> dict:
-    """Verify JWT token and return payload"""
+@lru_cache(maxsize=4096)
+def _decode_token(token: str) -> Optional[dict]:
+    """Decode and verify a JWT, memoized per token string"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
     except JWTError:
         return None
 
 
+def verify_token(token: str) -> dict:
+    """Verify JWT token and return payload"""
+    payload = _decode_token(token)
+    if payload is None:
+        return None
+    # Cached payloads outlive the decode-time expiry check, so re-check here
+    exp = payload.get("exp")
+    if exp is not None and exp <= time.time():
+        return None
+    return payload
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current user from JWT token"""
     try:
@@ -75,20 +91,38 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 
 class TokenEncryption:
-    """Encrypt and decrypt OAuth tokens using Fernet"""
+    """Encrypt and decrypt OAuth tokens using AES-GCM"""
+
+    # Marks tokens written by the AES-GCM path; anything else is legacy Fernet
+    PREFIX = "v2:"
+    NONCE_SIZE = 12
 
     def __init__(self):
-        # Derive a valid Fernet key from the settings key
         key = hashlib.sha256(settings.ENCRYPTION_KEY.encode()).digest()
+        self.aesgcm = AESGCM(hashlib.sha256(b"aesgcm:" + key).digest())
+        # Kept only to decrypt tokens stored before the switch to AES-GCM
         self.fernet = Fernet(base64.urlsafe_b64encode(key))
+        # A ciphertext always decrypts to the same token, so memoize per
+        # ciphertext; re-auth stores a new ciphertext and the old entry ages out
+        self._decrypt_cached = lru_cache(maxsize=1024)(self._decrypt)
 
     def encrypt_token(self, token: str) -> str:
         """Encrypt a token"""
-        return self.fernet.encrypt(token.encode()).decode()
+        nonce = os.urandom(self.NONCE_SIZE)
+        ciphertext = self.aesgcm.encrypt(nonce, token.encode(), None)
+        return self.PREFIX + base64.urlsafe_b64encode(nonce + ciphertext).decode()
 
     def decrypt_token(self, encrypted_token: str) -> str:
         """Decrypt a token"""
-        return self.fernet.decrypt(encrypted_token.encode()).decode()
+        return self._decrypt_cached(encrypted_token)
+
+    def _decrypt(self, encrypted_token: str) -> str:
+        """Decrypt a token without caching"""
+        if not encrypted_token.startswith(self.PREFIX):
+            return self.fernet.decrypt(encrypted_token.encode()).decode()
+        raw = base64.urlsafe_b64decode(encrypted_token[len(self.PREFIX):])
+        nonce, ciphertext = raw[:self.NONCE_SIZE], raw[self.NONCE_SIZE:]
+        return self.aesgcm.decrypt(nonce, ciphertext, None).decode()
 
 
 token_encryptor = TokenEncryption()
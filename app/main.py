@@ -2,17 +2,55 @@
 FastAPI Backend for AutoProjectPost
 Main application entry point
 """
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import orjson
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from app.core.config import settings
+from app.core.http import get_http_client, close_http_client
+from app.models.database import engine
 from app.api.v1 import auth, repos, posts, webhooks
 
+# Health bodies never change; serialize them once for load balancer probes
+ROOT_BODY = orjson.dumps({
+    "status": "healthy",
+    "service": "AutoProjectPost API",
+    "version": "1.0.0"
+})
+HEALTH_BODY = orjson.dumps({
+    "status": "ok",
+    "database": "connected",
+    "services": {
+        "github": "available",
+        "linkedin": "available",
+        "openai": "available"
+    }
+})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown"""
+    get_http_client()
+    await webhooks.project_queue.start()
+    await webhooks.webhook_coalescer.start()
+    yield
+    await webhooks.webhook_coalescer.stop()
+    await webhooks.project_queue.stop(timeout=settings.WEBHOOK_SHUTDOWN_TIMEOUT)
+    await close_http_client()
+    await engine.dispose()
+
+
 app = FastAPI(
     title="AutoProjectPost API",
     description="AI-powered GitHub to LinkedIn auto-posting service",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -24,6 +62,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger payloads such as repository listings
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(repos.router, prefix="/api/v1/repos", tags=["repos"])
@@ -34,32 +75,27 @@ app.include_router(webhooks.router, prefix="/api/v1/webhooks", tags=["webhooks"]
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "service": "AutoProjectPost API",
-        "version": "1.0.0"
-    }
+    return Response(ROOT_BODY, media_type="application/json")
 
 
 @app.get("/api/health")
 async def health_check():
     """Detailed health check"""
-    return {
-        "status": "ok",
-        "database": "connected",
-        "services": {
-            "github": "available",
-            "linkedin": "available",
-            "openai": "available"
-        }
-    }
+    return Response(HEALTH_BODY, media_type="application/json")
 
 
 if __name__ == "__main__":
+    import os
+    import sys
     import uvicorn
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        # uvloop isn't available on Windows; uvicorn[standard] skips it there
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        # reload and multiple workers are mutually exclusive
+        workers=None if settings.DEBUG else os.cpu_count()
     )
@@ -1,15 +1,48 @@
 """
 Database models and session management
 """
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from typing import AsyncGenerator
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Index, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from sqlalchemy.orm import relationship
 from app.core.config import settings
 
+
+def get_async_database_url(url: str) -> str:
+    """Point plain Postgres and SQLite URLs at their async drivers"""
+    for prefix in ("postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def get_engine_options(url: str) -> dict:
+    """Connection pool options; SQLite's pools don't take sizing arguments"""
+    if url.startswith("sqlite"):
+        return {}
+    options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,  # Replace connections dropped by the server
+    }
+    if get_async_database_url(url).startswith("postgresql+asyncpg://"):
+        # Our queries are short OLTP lookups; JIT compilation only adds latency
+        options["connect_args"] = {"server_settings": {"jit": "off"}}
+    return options
+
+
 # Database setup
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL),
+    **get_engine_options(settings.DATABASE_URL)
+)
+# expire_on_commit=False: attributes can't be lazily reloaded outside an await
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
@@ -25,8 +58,8 @@ class User(Base):
     linkedin_id = Column(String, unique=True, nullable=True)
     linkedin_access_token = Column(Text, nullable=True)  # Encrypted
     linkedin_refresh_token = Column(Text, nullable=True)  # Encrypted
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     is_active = Column(Boolean, default=True)
     
     # Relationships
@@ -47,8 +80,8 @@ class Repository(Base):
     url = Column(String)
     is_monitored = Column(Boolean, default=False)
     webhook_id = Column(String, nullable=True)
-    last_checked = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    last_checked = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="repos")
@@ -58,6 +91,10 @@ class Repository(Base):
 class LinkedInPost(Base):
     """LinkedIn post model"""
     __tablename__ = "linkedin_posts"
+    __table_args__ = (
+        Index("ix_posts_user_status", "user_id", "status"),
+        Index("ix_posts_repo_created", "repository_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -66,8 +103,8 @@ class LinkedInPost(Base):
     tone = Column(String)  # professional, playful, technical, cocky
     linkedin_post_id = Column(String, nullable=True)
     status = Column(String)  # draft, posted, failed
-    posted_at = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    posted_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="posts")
@@ -77,24 +114,25 @@ class LinkedInPost(Base):
 class WebhookEvent(Base):
     """Webhook event log"""
     __tablename__ = "webhook_events"
+    __table_args__ = (
+        Index("ix_webhook_unproc", "processed", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     repository_id = Column(Integer, ForeignKey("repositories.id"))
     event_type = Column(String)
     payload = Column(Text)
     processed = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
-def get_db():
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Database session dependency"""
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
+async def init_db():
     """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
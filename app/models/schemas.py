@@ -0,0 +1,16 @@
+"""
+Pydantic response schemas
+"""
+from typing import Optional
+from pydantic import BaseModel, ConfigDict
+
+
+class RepositoryOut(BaseModel):
+    """Monitored repository as returned by the API"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: Optional[str] = None
+    full_name: Optional[str] = None
+    url: Optional[str] = None
+    is_monitored: bool
@@ -1,14 +1,37 @@
 """
 Free summarization service using templates and rules (no external API costs)
 """
-from typing import Dict, List
+from collections import OrderedDict
+from operator import itemgetter
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import heapq
 import re
 import random
 
+FEATURES_CACHE_SIZE = 1024
+
 
 class FreeSummarizationService:
     """Free alternative to AI summarization using templates and rules"""
 
+    # Commit classification in a single case-insensitive pass; alternatives are
+    # tried in priority order, so an "add ... feature" commit wins over "implement"
+    _COMMIT_RE = re.compile(
+        r"(?=.*add)(?=.*(?:feature|functionality))(?P<feat>)"
+        r"|(?=.*implement)(?P<impl>)"
+        r"|(?=.*(?:optimize|performance))(?P<perf>)"
+        r"|(?=.*security)(?P<sec>)",
+        re.IGNORECASE | re.DOTALL | re.ASCII
+    )
+    _COMMIT_FEATURES = {
+        "feat": "new functionality",
+        "impl": "advanced implementation",
+        "perf": "performance optimization",
+        "sec": "security enhancements"
+    }
+
     def __init__(self):
         self.templates = {
             "professional": [
@@ -33,6 +56,41 @@ class FreeSummarizationService:
             ]
         }
 
+        # Templates pre-split into (literal, field) segments so rendering doesn't
+        # re-parse the format string; self.templates is kept as the source
+        self._compiled_templates = {
+            tone: [self._compile_template(template) for template in templates]
+            for tone, templates in self.templates.items()
+        }
+
+        # Feature strings keyed by a hash of the README and commits, so repeat
+        # summaries of the same repo state (retries, other tones) skip extraction
+        self._features_cache: "OrderedDict[bytes, str]" = OrderedDict()
+
+        # README keyword -> feature phrase, matched with one case-insensitive regex
+        self._feature_map = {
+            "api": "RESTful API design",
+            "database": "robust data management",
+            "authentication": "secure authentication",
+            "testing": "comprehensive testing",
+            "docker": "containerization",
+            "ci/cd": "automated deployment",
+            "react": "modern React architecture",
+            "typescript": "type-safe development",
+            "microservice": "microservices architecture",
+            "machine learning": "AI/ML capabilities",
+            "security": "advanced security features",
+            "performance": "high-performance optimization",
+            "scalability": "scalable architecture",
+            "ui/ux": "intuitive user interface"
+        }
+        self._feature_re = re.compile(
+            "|".join(re.escape(keyword) for keyword in self._feature_map),
+            # ASCII: Unicode case folding would also match e.g. "ſecurity",
+            # whose .lower() is not a key of the map
+            re.IGNORECASE | re.ASCII
+        )
+
     async def summarize_repository(self, repo_metadata: Dict, tone: str = "professional") -> str:
         """Generate a LinkedIn post summary for a repository using templates"""
 
@@ -45,68 +103,67 @@ class FreeSummarizationService:
 
         # Format languages
         if languages:
-            top_languages = sorted(languages.items(), key=lambda x: x[1], reverse=True)[:3]
+            top_languages = heapq.nlargest(3, languages.items(), key=itemgetter(1))
             languages_str = ", ".join([lang for lang, _ in top_languages])
         else:
             languages_str = "modern technologies"
 
         # Extract unique features from README and commits
-        unique_features = self._extract_features(readme, commits)
+        unique_features = self._cached_features(readme, commits)
 
         # Select random template for variety
-        template_list = self.templates.get(tone, self.templates["professional"])
-        template = random.choice(template_list)
+        template_list = self._compiled_templates.get(tone, self._compiled_templates["professional"])
+        segments = random.choice(template_list)
 
         # Fill in the template
-        summary = template.format(
-            name=name,
-            description=description,
-            languages=languages_str,
-            unique_features=unique_features
-        )
+        summary = self._render_template(segments, {
+            "name": name,
+            "description": description,
+            "languages": languages_str,
+            "unique_features": unique_features
+        })
 
         return summary
 
-    def _extract_features(self, readme: str, commits: List[Dict]) -> str:
-        """Extract unique features from README and commit messages"""
-        features = []
+    @staticmethod
+    def _compile_template(template: str) -> List[Tuple[str, Optional[str]]]:
+        """Split a str.format template into (literal, field name) segments"""
+        return [(literal, field_name) for literal, field_name, _, _ in Formatter().parse(template)]
+
+    @staticmethod
+    def _render_template(segments: List[Tuple[str, Optional[str]]], values: Dict[str, str]) -> str:
+        """Fill compiled template segments with values"""
+        return "".join(
+            literal + str(values[field_name]) if field_name else literal
+            for literal, field_name in segments
+        )
 
-        # Look for common feature indicators in README
-        readme_lower = readme.lower()
+    def _cached_features(self, readme: str, commits: List[Dict]) -> str:
+        """Extract features, memoized on the README and commit content"""
+        key = hashlib.blake2b((readme + str(commits[:10])).encode(), digest_size=16).digest()
+        features = self._features_cache.get(key)
+        if features is not None:
+            self._features_cache.move_to_end(key)
+            return features
 
-        feature_keywords = {
-            "api": "RESTful API design",
-            "database": "robust data management",
-            "authentication": "secure authentication",
-            "testing": "comprehensive testing",
-            "docker": "containerization",
-            "ci/cd": "automated deployment",
-            "react": "modern React architecture",
-            "typescript": "type-safe development",
-            "microservice": "microservices architecture",
-            "machine learning": "AI/ML capabilities",
-            "security": "advanced security features",
-            "performance": "high-performance optimization",
-            "scalability": "scalable architecture",
-            "ui/ux": "intuitive user interface"
-        }
+        features = self._extract_features(readme, commits)
+        self._features_cache[key] = features
+        if len(self._features_cache) > FEATURES_CACHE_SIZE:
+            self._features_cache.popitem(last=False)
+        return features
 
-        for keyword, feature in feature_keywords.items():
-            if keyword in readme_lower:
-                features.append(feature)
+    def _extract_features(self, readme: str, commits: List[Dict]) -> str:
+        """Extract unique features from README and commit messages"""
+        # Look for common feature indicators in README (single regex pass)
+        hits = {match.group(0).lower() for match in self._feature_re.finditer(readme)}
+        features = [self._feature_map[keyword] for keyword in hits]
 
         # Extract features from commit messages
         commit_features = []
         for commit in commits[:10]:  # Check last 10 commits
-            message = commit.get("message", "").lower()
-            if "add" in message and ("feature" in message or "functionality" in message):
-                commit_features.append("new functionality")
-            elif "implement" in message:
-                commit_features.append("advanced implementation")
-            elif "optimize" in message or "performance" in message:
-                commit_features.append("performance optimization")
-            elif "security" in message:
-                commit_features.append("security enhancements")
+            match = self._COMMIT_RE.match(commit.get("message", ""))
+            if match:
+                commit_features.append(self._COMMIT_FEATURES[match.lastgroup])
 
         # Combine and deduplicate
         all_features = list(set(features + commit_features))
@@ -1,9 +1,30 @@
 """
 GitHub API service for repository operations and webhooks
 """
+import asyncio
 import httpx
+import itertools
+import re
+from binascii import a2b_base64
 from typing import List, Dict, Optional
+from app.core.cache import MISSING, TTLCache
 from app.core.config import settings
+from app.core.http import get_http_client
+
+
+# Page number of the rel="last" link in GitHub's Link pagination header
+LAST_PAGE_RE = re.compile(r'<[^>]*[?&]page=(\d+)[^>]*>;\s*rel="last"')
+MAX_REPO_PAGES = 10
+# Summaries only use the start of the README; don't download the rest
+README_MAX_BYTES = 8192
+
+# Shared across service instances so webhook invalidation reaches every router.
+# Invalidation is per process, so with several uvicorn workers the others only
+# catch up on expiry; keep TTLs short enough for that to be acceptable
+_languages_cache = TTLCache(ttl=300)
+_contributors_cache = TTLCache(ttl=300)
+# Keyed on (full_name, max_bytes) so excerpts of different lengths don't mix
+_readme_cache = TTLCache(ttl=300)
 
 
 class GitHubService:
@@ -12,51 +33,87 @@ class GitHubService:
     def __init__(self):
         self.base_url = settings.GITHUB_API_URL
         self.rate_limit_remaining = settings.GITHUB_API_RATE_LIMIT
+        self._app_tokens = itertools.cycle(settings.GITHUB_APP_TOKENS) if settings.GITHUB_APP_TOKENS else None
+    
+    def server_token(self, user_token: str) -> str:
+        """Get the next app token for server-side calls, or the user's token if none are configured"""
+        if self._app_tokens is None:
+            return user_token
+        return next(self._app_tokens)
+    
+    async def server_token_for(self, user_token: str, full_name: str) -> str:
+        """Get an app token that can read the repository, else the user's token"""
+        token = self.server_token(user_token)
+        if token == user_token:
+            return token
+        try:
+            await self._request(f"/repos/{full_name}", token)
+        except httpx.HTTPStatusError as e:
+            # The app isn't installed on this repository (e.g. a private user repo)
+            if e.response.status_code in (401, 403, 404):
+                return user_token
+            raise
+        return token
+    
+    @staticmethod
+    def invalidate_repo_cache(full_name: str):
+        """Drop cached README, languages and contributors for a repository"""
+        for cache in (_languages_cache, _contributors_cache):
+            cache.invalidate(full_name)
+        _readme_cache.invalidate_matching(lambda key: key[0] == full_name)
     
     async def _make_request(self, endpoint: str, access_token: str, method: str = "GET", data: Optional[Dict] = None) -> Dict:
         """Make authenticated request to GitHub API"""
+        response = await self._request(endpoint, access_token, method, data)
+        return response.json() if response.content else {}
+    
+    async def _request(self, endpoint: str, access_token: str, method: str = "GET", data: Optional[Dict] = None, headers: Optional[Dict] = None) -> httpx.Response:
+        """Make authenticated request to GitHub API and return the raw response"""
         url = f"{self.base_url}{endpoint}"
         headers = {
             "Authorization": f"Bearer {access_token}",
             "Accept": "application/vnd.github.v3+json",
-            "User-Agent": "AutoProjectPost/1.0"
+            "User-Agent": "AutoProjectPost/1.0",
+            **(headers or {})
         }
         
-        async with httpx.AsyncClient() as client:
-            if method == "GET":
-                response = await client.get(url, headers=headers)
-            elif method == "POST":
-                response = await client.post(url, headers=headers, json=data)
-            elif method == "DELETE":
-                response = await client.delete(url, headers=headers)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            # Check rate limit
-            if response.status_code == 403 and "rate limit" in response.text.lower():
-                raise Exception("GitHub API rate limit exceeded")
-            
-            response.raise_for_status()
-            return response.json() if response.content else {}
+        if method not in ("GET", "POST", "DELETE"):
+            raise ValueError(f"Unsupported method: {method}")
+        
+        # Shared pooled client: keeps connections to GitHub alive between calls
+        response = await get_http_client().request(method, url, headers=headers, json=data)
+        
+        # Check rate limit
+        if response.status_code == 403 and "rate limit" in response.text.lower():
+            raise Exception("GitHub API rate limit exceeded")
+        
+        response.raise_for_status()
+        return response
     
     async def get_user_repos(self, access_token: str) -> List[Dict]:
         """Get user's repositories"""
-        repos = []
-        page = 1
+        endpoint = "/user/repos?page={page}&per_page=100&sort=updated&affiliation=owner"
+        response = await self._request(endpoint.format(page=1), access_token)
+        repos = response.json()
         
-        while True:
-            endpoint = f"/user/repos?page={page}&per_page=100&sort=updated&affiliation=owner"
-            page_repos = await self._make_request(endpoint, access_token)
-            
-            if not page_repos:
-                break
-                
-            repos.extend(page_repos)
-            page += 1
-            
-            # Limit to prevent excessive API calls
-            if len(repos) >= 1000:
-                break
+        last_page = LAST_PAGE_RE.search(response.headers.get("Link", ""))
+        if last_page:
+            # Page count is known up front, so fetch the rest in parallel
+            # (limited to prevent excessive API calls)
+            pages = await asyncio.gather(*[
+                self._make_request(endpoint.format(page=page), access_token)
+                for page in range(2, min(int(last_page.group(1)), MAX_REPO_PAGES) + 1)
+            ])
+            for page_repos in pages:
+                repos.extend(page_repos)
+        else:
+            # No pagination info; walk pages until one comes back empty
+            page = 2
+            page_repos = repos
+            while page_repos and len(repos) < MAX_REPO_PAGES * 100:
+                page_repos = await self._make_request(endpoint.format(page=page), access_token)
+                repos.extend(page_repos)
+                page += 1
         
         # Format repositories
         formatted_repos = []
@@ -81,20 +138,61 @@ class GitHubService:
         endpoint = f"/repositories/{repo_id}"
         return await self._make_request(endpoint, access_token)
     
-    async def get_repo_readme(self, access_token: str, full_name: str) -> str:
-        """Get repository README content"""
-        endpoint = f"/repos/{full_name}/readme"
+    async def get_repo_readme(self, access_token: str, full_name: str, max_bytes: Optional[int] = None) -> str:
+        """Get repository README content, optionally only its first max_bytes"""
+        key = (full_name, max_bytes)
+        readme = _readme_cache.get(key)
+        if readme is not MISSING:
+            return readme
         try:
-            response = await self._make_request(endpoint, access_token)
-            import base64
-            return base64.b64decode(response["content"]).decode("utf-8")
+            readme = await self._fetch_readme(access_token, full_name, max_bytes)
         except Exception:
             return ""
+        _readme_cache.set(key, readme)
+        return readme
+    
+    async def _fetch_readme(self, access_token: str, full_name: str, max_bytes: Optional[int]) -> str:
+        """Download the README as raw text, asking for only a byte range when capped"""
+        endpoint = f"/repos/{full_name}/readme"
+        headers = {"Accept": "application/vnd.github.raw"}
+        if max_bytes:
+            headers["Range"] = f"bytes=0-{max_bytes - 1}"
+        try:
+            response = await self._request(endpoint, access_token, headers=headers)
+            content = response.content
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 416:
+                raise
+            # Range not satisfiable (e.g. an empty file); use the JSON endpoint instead
+            content = await self._fetch_readme_json(access_token, full_name)
+        
+        # The server may ignore Range (200) or cut mid-character (206)
+        if max_bytes:
+            content = content[:max_bytes]
+        return content.decode("utf-8", errors="ignore")
+    
+    async def _fetch_readme_json(self, access_token: str, full_name: str) -> bytes:
+        """Get README bytes from the base64 JSON contents endpoint"""
+        endpoint = f"/repos/{full_name}/readme"
+        response = await self._make_request(endpoint, access_token)
+        if response.get("encoding") == "none":
+            # Files over 1MB come without inline content; fetch the raw file instead
+            raw = await get_http_client().get(
+                response["download_url"],
+                headers={"Authorization": f"Bearer {access_token}", "User-Agent": "AutoProjectPost/1.0"}
+            )
+            raw.raise_for_status()
+            return raw.content
+        return a2b_base64(response["content"])
     
     async def get_repo_languages(self, access_token: str, full_name: str) -> Dict:
         """Get repository language statistics"""
-        endpoint = f"/repos/{full_name}/languages"
-        return await self._make_request(endpoint, access_token)
+        languages = _languages_cache.get(full_name)
+        if languages is MISSING:
+            endpoint = f"/repos/{full_name}/languages"
+            languages = await self._make_request(endpoint, access_token)
+            _languages_cache.set(full_name, languages)
+        return languages
     
     async def get_repo_commits(self, access_token: str, full_name: str, limit: int = 10) -> List[Dict]:
         """Get recent commits"""
@@ -114,6 +212,9 @@ class GitHubService:
     
     async def get_repo_contributors(self, access_token: str, full_name: str) -> List[Dict]:
         """Get repository contributors"""
+        cached = _contributors_cache.get(full_name)
+        if cached is not MISSING:
+            return cached
         endpoint = f"/repos/{full_name}/contributors"
         contributors = await self._make_request(endpoint, access_token)
         
@@ -125,6 +226,7 @@ class GitHubService:
                 "avatar_url": contributor["avatar_url"]
             })
         
+        _contributors_cache.set(full_name, formatted_contributors)
         return formatted_contributors
     
     async def create_webhook(self, access_token: str, full_name: str) -> Optional[str]:
@@ -155,14 +257,14 @@ class GitHubService:
     async def get_repo_metadata(self, access_token: str, full_name: str) -> Dict:
         """Get comprehensive repository metadata for summarization"""
         try:
-            # Get basic repo info
-            repo_info = await self.get_repo_details(access_token, full_name.split("/")[1])
-            
-            # Get additional data
-            readme = await self.get_repo_readme(access_token, full_name)
-            languages = await self.get_repo_languages(access_token, full_name)
-            commits = await self.get_repo_commits(access_token, full_name)
-            contributors = await self.get_repo_contributors(access_token, full_name)
+            # Fetch basic repo info and additional data concurrently
+            repo_info, readme, languages, commits, contributors = await asyncio.gather(
+                self.get_repo_details(access_token, full_name.split("/")[1]),
+                self.get_repo_readme(access_token, full_name, max_bytes=README_MAX_BYTES),
+                self.get_repo_languages(access_token, full_name),
+                self.get_repo_commits(access_token, full_name),
+                self.get_repo_contributors(access_token, full_name)
+            )
             
             return {
                 "name": repo_info["name"],
@@ -1,9 +1,13 @@
 """
 LinkedIn API service for posting content
 """
-import httpx
+from collections import OrderedDict
 from typing import Optional, Dict
+import hashlib
 from app.core.config import settings
+from app.core.http import get_http_client
+
+URN_CACHE_SIZE = 10_000
 
 
 class LinkedInService:
@@ -11,6 +15,13 @@ class LinkedInService:
     
     def __init__(self):
         self.base_url = settings.LINKEDIN_API_URL
+        # Author URN per access token (keyed by a hash, never the raw token)
+        self._urn_cache: "OrderedDict[str, str]" = OrderedDict()
+    
+    @staticmethod
+    def _token_key(access_token: str) -> str:
+        """Hash a token for use as a cache key"""
+        return hashlib.blake2b(access_token.encode(), digest_size=16).hexdigest()
     
     async def _make_request(self, endpoint: str, access_token: str, method: str = "GET", data: Optional[Dict] = None) -> Dict:
         """Make authenticated request to LinkedIn API"""
@@ -21,36 +32,53 @@ class LinkedInService:
             "X-Restli-Protocol-Version": "2.0.0"
         }
         
-        async with httpx.AsyncClient() as client:
-            if method == "GET":
-                response = await client.get(url, headers=headers)
-            elif method == "POST":
-                response = await client.post(url, headers=headers, json=data)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            # Check rate limit
-            if response.status_code == 429:
-                raise Exception("LinkedIn API rate limit exceeded")
-            
-            response.raise_for_status()
-            return response.json() if response.content else {}
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Unsupported method: {method}")
+        
+        # Shared pooled client: keeps connections to LinkedIn alive between calls
+        response = await get_http_client().request(method, url, headers=headers, json=data)
+        
+        # The token was revoked or expired; its cached URN may be stale too
+        if response.status_code == 401:
+            self._urn_cache.pop(self._token_key(access_token), None)
+        
+        # Check rate limit
+        if response.status_code == 429:
+            raise Exception("LinkedIn API rate limit exceeded")
+        
+        response.raise_for_status()
+        return response.json() if response.content else {}
     
     async def get_user_profile(self, access_token: str) -> Dict:
         """Get LinkedIn user profile information"""
         endpoint = "/v2/people/~"
         return await self._make_request(endpoint, access_token)
     
-    async def post_content(self, access_token: str, content: str, visibility: str = "PUBLIC") -> str:
-        """Post content to LinkedIn"""
+    async def get_user_urn(self, access_token: str) -> str:
+        """Get the LinkedIn person ID for a token, cached until the token is rejected"""
+        key = self._token_key(access_token)
+        user_urn = self._urn_cache.get(key)
+        if user_urn:
+            self._urn_cache.move_to_end(key)
+            return user_urn
         
-        # First, get user URN
         profile = await self.get_user_profile(access_token)
         user_urn = profile.get("id")
         
         if not user_urn:
             raise Exception("Could not get user URN from LinkedIn")
         
+        self._urn_cache[key] = user_urn
+        if len(self._urn_cache) > URN_CACHE_SIZE:
+            self._urn_cache.popitem(last=False)
+        return user_urn
+    
+    async def post_content(self, access_token: str, content: str, visibility: str = "PUBLIC") -> str:
+        """Post content to LinkedIn"""
+        
+        # First, get user URN
+        user_urn = await self.get_user_urn(access_token)
+        
         # Create post payload
         post_data = {
             "author": f"urn:li:person:{user_urn}",
@@ -82,11 +110,7 @@ class LinkedInService:
         """Post content with media to LinkedIn"""
         
         # First, get user URN
-        profile = await self.get_user_profile(access_token)
-        user_urn = profile.get("id")
-        
-        if not user_urn:
-            raise Exception("Could not get user URN from LinkedIn")
+        user_urn = await self.get_user_urn(access_token)
         
         # Register media upload
         register_data = {
@@ -112,19 +136,18 @@ class LinkedInService:
     
     async def refresh_token(self, refresh_token: str) -> Dict:
         """Refresh LinkedIn access token"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                settings.LINKEDIN_TOKEN_URL,
-                data={
-                    "grant_type": "refresh_token",
-                    "refresh_token": refresh_token,
-                    "client_id": settings.LINKEDIN_CLIENT_ID,
-                    "client_secret": settings.LINKEDIN_CLIENT_SECRET
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"}
-            )
-            
-            if response.status_code != 200:
-                raise Exception("Failed to refresh LinkedIn token")
-            
-            return response.json()
\ No newline at end of file
+        response = await get_http_client().post(
+            settings.LINKEDIN_TOKEN_URL,
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": refresh_token,
+                "client_id": settings.LINKEDIN_CLIENT_ID,
+                "client_secret": settings.LINKEDIN_CLIENT_SECRET
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"}
+        )
+        
+        if response.status_code != 200:
+            raise Exception("Failed to refresh LinkedIn token")
+        
+        return response.json()
\ No newline at end of file
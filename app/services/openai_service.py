@@ -1,7 +1,10 @@
 """
 OpenAI service for repository summarization
 """
-import openai
+from itertools import islice
+from operator import itemgetter
+import heapq
+from openai import AsyncOpenAI
 from typing import Dict, List
 from app.core.config import settings
 
@@ -10,10 +13,29 @@ class OpenAIService:
     """Service for interacting with OpenAI API"""
     
     def __init__(self):
-        openai.api_key = settings.OPENAI_API_KEY
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = settings.OPENAI_MODEL
         self.max_tokens = settings.OPENAI_MAX_TOKENS
     
+    async def _complete(self, system_prompt: str, prompt: str, temperature: float) -> str:
+        """Run a chat completion, streaming the reply and joining the chunks"""
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=self.max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        
+        parts = []
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+        return "".join(parts).strip()
+    
     async def summarize_repository(self, repo_metadata: Dict, tone: str = "professional") -> str:
         """Generate a LinkedIn post summary for a repository"""
         
@@ -26,14 +48,14 @@ class OpenAIService:
         contributors = repo_metadata.get("contributors", [])
         
         # Format languages
-        top_languages = sorted(languages.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_languages = heapq.nlargest(5, languages.items(), key=itemgetter(1))
         languages_str = ", ".join([lang for lang, _ in top_languages])
         
         # Format recent commits
         commit_messages = []
-        for commit in commits[:5]:  # Last 5 commits
-            message = commit.get("message", "").split("\n")[0]  # First line only
-            if message and len(message) > 10:  # Filter out trivial commits
+        for commit in islice(commits, 5):  # Last 5 commits
+            message = commit.get("message", "").partition("\n")[0]  # First line only
+            if len(message) > 10:  # Filter out trivial commits
                 commit_messages.append(message[:100])  # Truncate long messages
         
         commits_str = "; ".join(commit_messages[:3])  # Top 3 meaningful commits
@@ -56,17 +78,11 @@ Output:
 """
         
         try:
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a technical writer creating engaging LinkedIn posts about software projects."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=self.max_tokens,
+            summary = await self._complete(
+                "You are a technical writer creating engaging LinkedIn posts about software projects.",
+                prompt,
                 temperature=0.7
             )
-            
-            summary = response.choices[0].message.content.strip()
             return summary
             
         except Exception as e:
@@ -96,17 +112,11 @@ Make it engaging, professional, and suitable for LinkedIn. Include relevant hash
 """
         
         try:
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a social media content creator specializing in technical posts."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=self.max_tokens,
+            customized_post = await self._complete(
+                "You are a social media content creator specializing in technical posts.",
+                prompt,
                 temperature=0.8
             )
-            
-            customized_post = response.choices[0].message.content.strip()
             return customized_post
             
         except Exception as e:
@@ -0,0 +1,78 @@
+"""
+Coalesce bursts of webhook jobs so each repository is processed once per window
+"""
+import asyncio
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class WebhookCoalescer:
+    """Collect jobs for a short window, keep the latest per key, then forward them"""
+
+    def __init__(self, forward: Callable[..., bool], window: float = 2.0, maxsize: int = 1000):
+        self.forward = forward
+        self.window = window
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Dict[Hashable, Tuple[Any, ...]] = {}
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        """Create the queue and start the collector on the running event loop"""
+        if self.running:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        """Stop collecting and forward everything still pending"""
+        if not self.running:
+            return
+        # wait_for can swallow a cancel that races a completed get, so the
+        # collector also checks this flag and exits on its own
+        self._stopping = True
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        while not self._queue.empty():
+            key, args = self._queue.get_nowait()
+            self._pending[key] = args
+        self._flush()
+        self._task = None
+        self._queue = None
+
+    def submit(self, key: Hashable, *args) -> bool:
+        """Queue a job under a dedupe key; returns False if stopped or full"""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait((key, args))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _collect(self):
+        """Gather jobs for one window after the first arrives, then flush"""
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            key, args = await self._queue.get()
+            self._pending[key] = args
+            deadline = loop.time() + self.window
+            while not self._stopping and (remaining := deadline - loop.time()) > 0:
+                try:
+                    key, args = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._pending[key] = args  # Later events supersede earlier ones
+            self._flush()
+
+    def _flush(self):
+        """Forward one job per key"""
+        pending, self._pending = self._pending, {}
+        for key, args in pending.items():
+            if not self.forward(*args):
+                print(f"Dropped coalesced webhook job for {key}: worker queue unavailable")
@@ -0,0 +1,61 @@
+"""
+Bounded worker pool for webhook-triggered background processing
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+class WebhookWorkerPool:
+    """Queue webhook jobs and run them on a fixed number of consumer tasks"""
+
+    def __init__(self, handler: Callable[..., Awaitable[Any]], workers: int = 8, maxsize: int = 1000):
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Create the queue and spawn consumers on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 0):
+        """Wait up to timeout seconds for queued jobs, then cancel consumers"""
+        if self.running and timeout > 0:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"Dropping {self._queue.qsize()} queued webhook jobs on shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def submit(self, *args) -> bool:
+        """Queue a job without waiting; returns False if the pool is stopped or full"""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(args)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _consume(self):
+        """Run queued jobs one at a time until cancelled"""
+        while True:
+            args = await self._queue.get()
+            try:
+                await self.handler(*args)
+            except Exception as e:
+                print(f"Webhook job failed: {str(e)}")
+            finally:
+                self._queue.task_done()
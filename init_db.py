@@ -2,37 +2,41 @@
 """
 Database initialization script for AutoProjectPost
 """
+import asyncio
 import sys
-import os
-from pathlib import Path
-
-# Add the app directory to the Python path
-sys.path.insert(0, str(Path(__file__).parent / "app"))
-
 from app.models.database import init_db, engine, Base
 from app.core.config import settings
 
+
+async def create_tables():
+    """Create all tables; init_db emits the DDL inside one engine.begin() transaction"""
+    await init_db()
+    await engine.dispose()
+
+
 def main():
     """Initialize the database"""
-    print("🚀 Initializing AutoProjectPost database...")
+    # Collect the messages and write them once instead of a print per line
+    lines = [
+        "🚀 Initializing AutoProjectPost database...",
+        "📋 Creating database tables...",
+    ]
 
     try:
         # Create all tables
-        print("📋 Creating database tables...")
-        init_db()
-
-        # Verify tables were created
-        from sqlalchemy import inspect
-        inspector = inspect(engine)
+        asyncio.run(create_tables())
+        tables = list(Base.metadata.tables)
 
-        tables = inspector.get_table_names()
-        print(f"✅ Created {len(tables)} tables: {', '.join(tables)}")
+        # Report the tables the schema defines
+        lines.append(f"✅ Created {len(tables)} tables: {', '.join(tables)}")
 
-        print("🎉 Database initialization completed successfully!")
-        print(f"📍 Database location: {settings.DATABASE_URL}")
+        lines.append("🎉 Database initialization completed successfully!")
+        lines.append(f"📍 Database location: {settings.DATABASE_URL}")
+        sys.stdout.write("\n".join(lines) + "\n")
 
     except Exception as e:
-        print(f"❌ Error initializing database: {e}")
+        lines.append(f"❌ Error initializing database: {e}")
+        sys.stdout.write("\n".join(lines) + "\n")
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,72 +1,434 @@
 """
 Backend unit tests
 """
+import asyncio
 import pytest
-from fastapi.testclient import TestClient
-from app.main import app
-from app.core.config import settings
-from app.models.database import init_db, get_db
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import os
-
-# Test database
-TEST_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(TEST_DATABASE_URL)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# The app is imported inside fixtures so collection (-k, --collect-only) stays cheap
+
+# Test database: in memory, with StaticPool holding the single connection
+# so the tables survive between sessions
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+engine = create_async_engine(TEST_DATABASE_URL, echo=False, future=True, poolclass=StaticPool)
+# expire_on_commit=False: no reload SELECT after each commit; tests that need
+# to re-read rows changed elsewhere must call session.expire_all() first
+TestingSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+# Let SQLAlchemy emit BEGIN itself; the sqlite3 driver's implicit transactions
+# break SAVEPOINT handling, which the per-test rollback relies on
+@event.listens_for(engine.sync_engine, "connect")
+def do_connect(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+    # Test data is disposable: skip fsyncs and on-disk journals
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA locking_mode=EXCLUSIVE")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # Size the page cache up front; page_size only applies before the first table exists
+    cursor.execute("PRAGMA page_size=4096")
+    cursor.execute("PRAGMA cache_size=-8192")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+@event.listens_for(engine.sync_engine, "begin")
+def do_begin(conn):
+    conn.exec_driver_sql("BEGIN")
 
 # Override dependencies
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
+async def override_get_db():
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-app.dependency_overrides[get_db] = override_get_db
+async def create_schema_fast(engine):
+    """Create the schema in one transaction without per-table existence checks"""
+    from app.models.database import Base
+    async with engine.begin() as conn:
+        # A single probe guards the whole schema, so create_all needn't check each table
+        if not await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("users")):
+            await conn.run_sync(Base.metadata.create_all, checkfirst=False)
 
-client = TestClient(app)
-
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session", autouse=True)
 def test_db():
-    # Create test database
-    init_db()
+    # Create test database once for the whole run
+    asyncio.run(create_schema_fast(engine))
     yield
-    # Clean up
-    os.remove("./test.db")
+    # Close the pooled connection; its aiosqlite thread would keep the process alive
+    asyncio.run(engine.dispose())
+
+@pytest_asyncio.fixture
+async def db_session():
+    """Session inside an outer transaction that is rolled back after the test"""
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        # Every session, including the app's, commits to a SAVEPOINT on this connection
+        TestingSessionLocal.configure(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            async with TestingSessionLocal() as session:
+                yield session
+        finally:
+            TestingSessionLocal.configure(bind=engine, join_transaction_mode="conditional_savepoint")
+            await transaction.rollback()
 
-def test_health_check():
+@pytest.fixture(autouse=True)
+def _override_db(db_session):
+    # Depends on db_session so every test's app sessions are rolled back afterwards
+    from app.main import app
+    from app.models.database import get_db
+    app.dependency_overrides[get_db] = override_get_db
+    yield
+    app.dependency_overrides.pop(get_db, None)
+
+@pytest_asyncio.fixture
+async def client():
+    from app.main import app
+    # ASGITransport doesn't send lifespan events, so run the app's lifespan
+    # around the client to start the HTTP client and webhook workers
+    async with app.router.lifespan_context(app):
+        # Call the ASGI app directly; no per-request hop into a TestClient thread
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            yield ac
+
+async def test_health_check(client):
     """Test health check endpoint"""
-    response = client.get("/api/health")
+    response = await client.get("/api/health")
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
 
-def test_root_endpoint():
+async def test_root_endpoint(client):
     """Test root endpoint"""
-    response = client.get("/")
+    response = await client.get("/")
     assert response.status_code == 200
     assert "AutoProjectPost" in response.json()["service"]
 
-def test_github_login_redirect():
-    """Test GitHub OAuth login redirect"""
-    response = client.get("/api/v1/auth/github/login")
-    assert response.status_code == 200
-    assert "auth_url" in response.json()
-    assert "github.com/login/oauth/authorize" in response.json()["auth_url"]
+async def test_lifespan_starts_webhook_workers(client):
+    """Test the app lifespan runs around the test client"""
+    from app.api.v1 import webhooks
+    assert webhooks.project_queue.running
+    assert webhooks.webhook_coalescer.running
 
-def test_linkedin_login_redirect():
-    """Test LinkedIn OAuth login redirect"""
-    response = client.get("/api/v1/auth/linkedin/login")
+@pytest.mark.parametrize("path,needle", [
+    ("/api/v1/auth/github/login", "github.com/login/oauth/authorize"),
+    ("/api/v1/auth/linkedin/login", "linkedin.com/oauth/v2/authorization"),
+])
+async def test_oauth_login_redirect(client, path, needle):
+    """Test OAuth login redirects"""
+    response = await client.get(path)
     assert response.status_code == 200
-    assert "auth_url" in response.json()
-    assert "linkedin.com/oauth/v2/authorization" in response.json()["auth_url"]
+    body = response.json()
+    assert "auth_url" in body
+    assert needle in body["auth_url"]
 
-def test_get_available_tones():
+async def test_get_available_tones(client):
     """Test getting available post tones"""
-    response = client.get("/api/v1/posts/tones")
+    response = await client.get("/api/v1/posts/tones")
     assert response.status_code == 200
     tones = response.json()["tones"]
-    assert "professional" in tones
-    assert "playful" in tones
-    assert "technical" in tones
-    assert "cocky" in tones
\ No newline at end of file
+    assert {"professional", "playful", "technical", "cocky"}.issubset(tones)
+
+def test_extract_features_ignores_non_ascii_case_folds():
+    """README keywords only match ASCII case variants"""
+    from app.services.free_summarization_service import FreeSummarizationService
+    service = FreeSummarizationService()
+    assert "secure authentication" in service._extract_features("AUTHENTICATION", [])
+    # Unicode case folding would match these, but their .lower() isn't a keyword
+    for readme in ("AUTHENTİCATİON", "ſecurity"):
+        assert "secure authentication" not in service._extract_features(readme, [])
+
+def test_token_encryption_round_trip():
+    """Test AES-GCM tokens decrypt to the original value"""
+    from app.core.security import TokenEncryption
+    encryptor = TokenEncryption()
+    encrypted = encryptor.encrypt_token("gho_secret")
+    assert encrypted.startswith(TokenEncryption.PREFIX)
+    assert encryptor.decrypt_token(encrypted) == "gho_secret"
+
+def test_token_encryption_decrypts_legacy_fernet():
+    """Test tokens stored before the AES-GCM switch still decrypt"""
+    import base64
+    import hashlib
+    from cryptography.fernet import Fernet
+    from app.core.config import settings
+    from app.core.security import TokenEncryption
+    # Same key derivation the Fernet-only implementation used
+    key = hashlib.sha256(settings.ENCRYPTION_KEY.encode()).digest()
+    legacy = Fernet(base64.urlsafe_b64encode(key)).encrypt(b"gho_legacy").decode()
+    assert TokenEncryption().decrypt_token(legacy) == "gho_legacy"
+
+def test_token_encryption_rejects_tampered_ciphertext():
+    """Test a modified AES-GCM token fails authentication"""
+    import base64
+    from cryptography.exceptions import InvalidTag
+    from app.core.security import TokenEncryption
+    encryptor = TokenEncryption()
+    encrypted = encryptor.encrypt_token("gho_secret")
+    raw = bytearray(base64.urlsafe_b64decode(encrypted[len(TokenEncryption.PREFIX):]))
+    raw[-1] ^= 1
+    tampered = TokenEncryption.PREFIX + base64.urlsafe_b64encode(bytes(raw)).decode()
+    with pytest.raises(InvalidTag):
+        encryptor.decrypt_token(tampered)
+
+@pytest.mark.parametrize("make_signature,valid", [
+    (lambda digest: "sha256=" + digest, True),
+    (lambda digest: "sha256=" + "0" * len(digest), False),
+    (lambda digest: "sha1=" + digest, False),
+    (lambda digest: "sha256=not-hex", False),
+])
+def test_verify_webhook_signature(make_signature, valid):
+    """Test GitHub webhook signature verification"""
+    import hashlib
+    import hmac
+    from app.api.v1.webhooks import verify_webhook_signature
+    body = b'{"ref": "refs/heads/main"}'
+    digest = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+    assert verify_webhook_signature(body, make_signature(digest), b"secret") is valid
+
+async def test_webhook_worker_pool_runs_jobs_and_drains_on_stop():
+    """Test queued jobs run and stop() waits for the backlog"""
+    from app.services.webhook_worker import WebhookWorkerPool
+    done = []
+
+    async def handler(name):
+        await asyncio.sleep(0.01)
+        done.append(name)
+
+    pool = WebhookWorkerPool(handler, workers=2, maxsize=10)
+    assert not pool.submit("early")  # Not started yet
+    await pool.start()
+    for name in ("a", "b", "c"):
+        assert pool.submit(name)
+    await pool.stop(timeout=1)
+    assert sorted(done) == ["a", "b", "c"]
+    assert not pool.running
+    assert not pool.submit("late")
+
+async def test_webhook_worker_pool_rejects_when_full():
+    """Test submit returns False once the queue is full"""
+    from app.services.webhook_worker import WebhookWorkerPool
+    release = asyncio.Event()
+
+    async def handler(name):
+        await release.wait()
+
+    pool = WebhookWorkerPool(handler, workers=1, maxsize=1)
+    await pool.start()
+    assert pool.submit("running")
+    await asyncio.sleep(0)  # Let the worker take the first job
+    assert pool.submit("queued")
+    assert not pool.submit("overflow")
+    release.set()
+    await pool.stop(timeout=1)
+
+async def test_webhook_coalescer_keeps_latest_job_per_key():
+    """Test a burst for one key is forwarded once with the latest arguments"""
+    from app.services.webhook_coalescer import WebhookCoalescer
+    forwarded = []
+    coalescer = WebhookCoalescer(lambda *args: forwarded.append(args) or True, window=0.05)
+    assert not coalescer.submit("repo", 0)  # Not started yet
+    await coalescer.start()
+    for n in range(5):
+        assert coalescer.submit("repo", n)
+    assert coalescer.submit("other", 9)
+    await asyncio.sleep(0.2)
+    assert sorted(forwarded) == [(4,), (9,)]
+    await coalescer.stop()
+
+async def test_webhook_coalescer_flushes_pending_on_stop():
+    """Test jobs still inside the window are forwarded on stop"""
+    from app.services.webhook_coalescer import WebhookCoalescer
+    forwarded = []
+    coalescer = WebhookCoalescer(lambda *args: forwarded.append(args) or True, window=10)
+    await coalescer.start()
+    coalescer.submit("repo", "first")
+    await asyncio.sleep(0)  # Let the collector open its window
+    coalescer.submit("repo", "second")
+    await coalescer.stop()
+    assert forwarded == [("second",)]
+    assert not coalescer.submit("repo", "late")
+
+@pytest.mark.parametrize("url,expected", [
+    ("postgresql://u:p@host/db", "postgresql+asyncpg://u:p@host/db"),
+    ("postgres://u:p@host/db", "postgresql+asyncpg://u:p@host/db"),
+    ("sqlite:///./local.db", "sqlite+aiosqlite:///./local.db"),
+    ("sqlite+aiosqlite:///./local.db", "sqlite+aiosqlite:///./local.db"),
+])
+def test_get_async_database_url(url, expected):
+    """Test plain database URLs are mapped to async drivers"""
+    from app.models.database import get_async_database_url
+    assert get_async_database_url(url) == expected
+
+@pytest.mark.parametrize("app_status,expected", [(200, "app-token"), (404, "user-token")])
+async def test_server_token_falls_back_to_user_token(monkeypatch, app_status, expected):
+    """Test app tokens are only used for repositories the app can read"""
+    import itertools
+    import httpx
+    from app.services import github_service as github_module
+
+    def handler(request):
+        if request.headers["Authorization"] == "Bearer app-token":
+            return httpx.Response(app_status, json={})
+        return httpx.Response(200, json={})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as mock_client:
+        monkeypatch.setattr(github_module, "get_http_client", lambda: mock_client)
+        service = github_module.GitHubService()
+        service._app_tokens = itertools.cycle(["app-token"])
+        assert await service.server_token_for("user-token", "owner/repo") == expected
+
+async def test_readme_cache_is_keyed_on_excerpt_length(monkeypatch):
+    """Test README excerpts of different lengths are cached separately"""
+    from app.services import github_service as github_module
+    service = github_module.GitHubService()
+    service.invalidate_repo_cache("owner/repo")
+    readme = "# Title\n" + "x" * 100
+
+    async def fetch_readme(access_token, full_name, max_bytes):
+        return readme if max_bytes is None else readme[:max_bytes]
+
+    monkeypatch.setattr(service, "_fetch_readme", fetch_readme)
+    assert await service.get_repo_readme("token", "owner/repo", max_bytes=8) == "# Title\n"
+    assert await service.get_repo_readme("token", "owner/repo", max_bytes=20) == readme[:20]
+    assert await service.get_repo_readme("token", "owner/repo") == readme
+    service.invalidate_repo_cache("owner/repo")
+    assert not [key for key in github_module._readme_cache._data if key[0] == "owner/repo"]
+
+async def test_post_to_linkedin_rejects_undecryptable_token(client, db_session):
+    """Test a corrupt stored LinkedIn token asks for reauthorization"""
+    from app.models.database import LinkedInPost, User
+    user = User(email="dev@example.com", linkedin_access_token="v2:corrupt")
+    db_session.add(user)
+    await db_session.flush()
+    post = LinkedInPost(user_id=user.id, content="Hello", tone="professional", status="draft")
+    db_session.add(post)
+    await db_session.commit()
+
+    response = await client.post(f"/api/v1/posts/linkedin/{post.id}", params={"user_id": user.id})
+    assert response.status_code == 400
+    assert "reauthorize" in response.json()["detail"]
+    await db_session.refresh(post)
+    assert post.status == "draft"
+
+@pytest.mark.parametrize("page_sizes,link_last,expected_pages", [
+    ([100, 100, 40], 3, [1, 2, 3]),  # Link header: remaining pages fetched together
+    ([100] * 25, 25, list(range(1, 11))),  # Capped at MAX_REPO_PAGES
+    ([100, 100, 50], None, [1, 2, 3, 4]),  # No Link header: walk until an empty page
+])
+async def test_get_user_repos_pagination(monkeypatch, page_sizes, link_last, expected_pages):
+    """Test repository listing follows GitHub pagination"""
+    import httpx
+    from app.services import github_service as github_module
+    requested = []
+
+    def handler(request):
+        page = int(request.url.params["page"])
+        requested.append(page)
+        size = page_sizes[page - 1] if page <= len(page_sizes) else 0
+        repos = [{
+            "id": page * 1000 + n, "name": "r", "full_name": "o/r", "html_url": "u",
+            "private": False, "stargazers_count": 0, "forks_count": 0, "updated_at": "2024-01-01"
+        } for n in range(size)]
+        headers = {}
+        if link_last:
+            headers["Link"] = f'<https://api.github.com/user/repos?page={link_last}&per_page=100>; rel="last"'
+        return httpx.Response(200, json=repos, headers=headers)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as mock_client:
+        monkeypatch.setattr(github_module, "get_http_client", lambda: mock_client)
+        repos = await github_module.GitHubService().get_user_repos("token")
+
+    assert sorted(requested) == expected_pages
+    assert len(repos) == sum(page_sizes[:len(expected_pages)])
+
+@pytest.fixture
+def github_calls(monkeypatch):
+    """Stub the GitHub calls made by the repos routes and record webhook changes"""
+    from app.api.v1 import repos
+    calls = []
+
+    async def get_repo_details(access_token, repo_id):
+        return {"name": "repo", "full_name": "owner/repo", "html_url": "https://github.com/owner/repo"}
+
+    async def create_webhook(access_token, full_name):
+        calls.append(("create", full_name))
+        return "99"
+
+    async def delete_webhook(access_token, full_name, webhook_id):
+        calls.append(("delete", full_name, webhook_id))
+
+    monkeypatch.setattr(repos.github_service, "get_repo_details", get_repo_details)
+    monkeypatch.setattr(repos.github_service, "create_webhook", create_webhook)
+    monkeypatch.setattr(repos.github_service, "delete_webhook", delete_webhook)
+    return calls
+
+async def add_github_user(db_session, email):
+    from app.core.security import token_encryptor
+    from app.models.database import User
+    user = User(email=email, github_id=email, github_access_token=token_encryptor.encrypt_token("gho_token"))
+    db_session.add(user)
+    await db_session.commit()
+    return user
+
+async def test_monitor_new_repository(client, db_session, github_calls):
+    """Test monitoring a new repository stores it with its webhook"""
+    from sqlalchemy import select
+    from app.models.database import Repository
+    user = await add_github_user(db_session, "dev@example.com")
+    response = await client.post("/api/v1/repos/monitor/42", params={"user_id": user.id})
+    assert response.status_code == 200
+    assert github_calls == [("create", "owner/repo")]
+    repo = await db_session.scalar(select(Repository).where(Repository.github_repo_id == "42"))
+    assert repo.is_monitored and repo.webhook_id == "99"
+
+async def test_monitor_existing_repository(client, db_session, github_calls):
+    """Test re-monitoring a known repository doesn't create another webhook"""
+    from app.models.database import Repository
+    user = await add_github_user(db_session, "dev@example.com")
+    repo = Repository(user_id=user.id, github_repo_id="42", full_name="owner/repo", is_monitored=False)
+    db_session.add(repo)
+    await db_session.commit()
+    response = await client.post("/api/v1/repos/monitor/42", params={"user_id": user.id})
+    assert response.status_code == 200
+    assert github_calls == []
+    await db_session.refresh(repo)
+    assert repo.is_monitored
+
+async def test_monitor_repository_tracked_by_another_user(client, db_session, github_calls):
+    """Test a unique conflict fails before any webhook is created"""
+    from app.models.database import Repository
+    owner = await add_github_user(db_session, "owner@example.com")
+    db_session.add(Repository(user_id=owner.id, github_repo_id="42", full_name="owner/repo", is_monitored=True))
+    other = await add_github_user(db_session, "other@example.com")
+    response = await client.post("/api/v1/repos/monitor/42", params={"user_id": other.id})
+    assert response.status_code == 400
+    assert github_calls == []
+
+async def test_monitor_repository_removes_webhook_when_commit_fails(client, db_session, github_calls, monkeypatch):
+    """Test a failed commit deletes the webhook created alongside it"""
+    from sqlalchemy.ext.asyncio import AsyncSession
+    user = await add_github_user(db_session, "dev@example.com")
+
+    async def failing_commit(self):
+        raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(AsyncSession, "commit", failing_commit)
+    response = await client.post("/api/v1/repos/monitor/42", params={"user_id": user.id})
+    assert response.status_code == 400
+    assert github_calls == [("create", "owner/repo"), ("delete", "owner/repo", "99")]
+
+def test_verify_token_rejects_cached_token_after_expiry():
+    """Test a token verified once is rejected from the cache after it expires"""
+    import time
+    from datetime import timedelta
+    from app.core.security import _decode_token, create_access_token, verify_token
+    token = create_access_token({"sub": "1"}, expires_delta=timedelta(seconds=1))
+    payload = verify_token(token)
+    assert payload is not None
+    hits = _decode_token.cache_info().hits
+    time.sleep(max(0, payload["exp"] - time.time()) + 0.05)
+    assert verify_token(token) is None
+    assert _decode_token.cache_info().hits == hits + 1  # Rejected via the cached payload